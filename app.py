@@ -1,20 +1,111 @@
 import streamlit as st
 import re
+import sys
 import datetime
+import json
 import logging
+import os
+import queue
+import random
+import threading
+import time
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice, repeat
 from operator import itemgetter
-from googleapiclient.discovery import build
+from types import MappingProxyType
+from zoneinfo import ZoneInfo
+import httplib2
+import numpy as np
+import pandas as pd
+import google_auth_httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from google.auth.credentials import AnonymousCredentials
+from google.auth.exceptions import TransportError
 from google.oauth2 import service_account
+from sheet_sources import FakeSheetsServer, LocalFileSource, generate_rows, load_rows
 
 # Set up logging to suppress debug messages in the Streamlit UI
 logging.basicConfig(level=logging.INFO)  # Change to logging.DEBUG to see detailed logs in the console
 
 # Your Google Sheets spreadsheet details
 SPREADSHEET_ID = '1qhm1d8nUyckL5PIApqwOclg4JtzJD3j3bArWKabaGcg'  # Replace with your actual spreadsheet ID
-RANGE_NAME = 'PRIORITY!A1:B1000'  # Adjust to the actual range that captures both timestamp and destination
+SHEET_NAME = 'PRIORITY'  # Tab that the booking form appends its responses to
+RANGE_NAME = f'{SHEET_NAME}!A:B'  # Timestamp and destination columns, with no row cap
+SHEET_PAGE_SIZE = 5000  # Rows requested per API call when paging through the sheet
 
-# Global variable to keep track of potential total revenue for the day
-total_revenue = 0
+# Where sheet rows come from: 'google' (live Sheets API), 'local' (CSV/JSONL file) or
+# 'fake' (in-process fake Sheets API serving the local file, or a synthetic sheet if it is missing)
+DATA_SOURCE = os.environ.get('PRIORITY_DATA_SOURCE', 'google')
+LOCAL_DATA_PATH = os.environ.get('PRIORITY_DATA_PATH', 'priority.csv')
+FAKE_SHEET_ROWS = 10000  # Synthetic bookings served by the fake Sheets API when there is no local file
+
+# Ask the API for raw date-time serial numbers instead of formatted strings, so timestamps need no strptime
+SERIAL_TIMESTAMPS = True
+SHEETS_EPOCH = datetime.datetime(1899, 12, 30)  # Day zero of Google Sheets date serial numbers
+SHEETS_EPOCH_ORDINAL = SHEETS_EPOCH.toordinal()
+
+# Time zone the booking form writes timestamps in; "now" is read in this zone so it lines up with sheet rows
+SHEET_TIMEZONE = ZoneInfo('Africa/Nairobi')
+
+TIMESTAMP_FORMATS = ['%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']  # Add flexibility in timestamp formats
+TIMESTAMP_SNIFF_SAMPLE = 50  # Cells sampled to detect a timestamp column's layout
+
+# Destination labels look like 'Junction (100 KSH)'; one grammar yields both the price and the clean name
+DESTINATION_PRICE_PATTERN = re.compile(r"\s*\((\d+)\s*KSH\)", re.IGNORECASE)
+DESTINATION_CACHE_SIZE = 1024  # Distinct raw labels memoized; the form offers a small fixed set
+
+# Bad rows kept as examples in each refresh's parse summary
+PARSE_ERROR_SAMPLE_SIZE = 5
+
+# Parse whole columns with pandas/NumPy instead of a Python loop over rows
+VECTORIZED_PARSING = True
+
+# Fold bookings into the aggregate cube with np.bincount instead of a Python loop over rows
+VECTORIZED_AGGREGATION = True
+
+# Only fetch rows appended since the last refresh instead of re-downloading the whole sheet
+INCREMENTAL_SYNC = True
+
+# Shift window shown on the board (it may cross midnight) and the width of each time bucket in it
+SHIFT_START = datetime.time(23, 0)  # 11 PM
+SHIFT_END = datetime.time(7, 0)  # 7 AM
+BUCKET_MINUTES = 60  # 15, 30 or 60
+
+# Sliding windows, in minutes, for the live "waiting right now" view; the ring buffer holds the longest
+LIVE_WINDOWS_MINUTES = (30, 60)
+
+# Closed shifts of the same weekday needed before a bucket's "usual" demand is shown
+BASELINE_MIN_SHIFTS = 3
+# Smallest spread, in passengers, a count must leave the usual mean by to be called busier or quieter;
+# keeps a steady history (standard deviation 0) from calling every change "about usual"
+BASELINE_MIN_DEVIATION = 1.0
+
+# Weight of the newest shift in each bucket's smoothed demand used for the next-bucket forecast
+FORECAST_SMOOTHING = 0.3
+
+# How long fetched sheet values are reused across sessions before hitting the Sheets API again
+SHEET_CACHE_TTL_SECONDS = 60
+
+# Pinned Sheets v4 discovery document shipped with the app, so building a client never fetches it
+SHEETS_DISCOVERY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sheets_v4_discovery.json')
+
+# Refresh the service account access token this long before it expires
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+HTTP_TIMEOUT_SECONDS = 30
+HTTP_POOL_SIZE = 8  # Idle keep-alive transports kept for reuse across script runs
+
+# Sheets API read quota per user per minute; every session reads as the one service account, so this is the binding limit
+SHEETS_READ_QUOTA_PER_MINUTE = 60
+RATE_LIMIT_BURST = 10  # Requests that may go out back to back before the limiter starts spacing them
+
+# Retry 429 and 5xx responses, and connection failures, with jittered exponential backoff
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_FETCH_RETRIES = 5
+RETRY_BASE_DELAY_SECONDS = 1
+RETRY_MAX_DELAY_SECONDS = 32
 
 def authenticate_service_account():
     """Authenticate using service account credentials stored in Streamlit secrets."""
@@ -29,127 +120,1519 @@ def authenticate_service_account():
         logging.error(f"Error in authentication: {e}")
         raise
 
-def extract_price_from_destination(destination):
-    """Extract the price from the format 'Destination (Price)'."""
-    match = re.search(r"\((\d+)\s*KSH\)", destination, re.IGNORECASE)
-    if match:
-        price = int(match.group(1))  # Extract the price in KSH
-        return price
-    return 0  # Return 0 if no price found
+@lru_cache(maxsize=DESTINATION_CACHE_SIZE)
+def parse_destination(destination):
+    """Split 'Destination (Price KSH)' into an interned (clean name, price) pair, memoized per raw label."""
+    match = DESTINATION_PRICE_PATTERN.search(destination)
+    if not match:
+        return sys.intern(destination), 0  # Return 0 if no price found
+    clean_dest = destination[:match.start()] + destination[match.end():]
+    return sys.intern(clean_dest), int(match.group(1))
 
-def is_within_hour_range(timestamp_str, start_hour, end_hour):
-    """Check if the timestamp falls within the given hourly range."""
-    try:
-        timestamp_formats = ['%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']  # Add flexibility in timestamp formats
-        timestamp = None
-        for fmt in timestamp_formats:
+def parse_timestamp(timestamp_str):
+    """Parse a sheet timestamp string, returning None if no known format matches."""
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.datetime.strptime(timestamp_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+def _parse_iso_fixed(s):
+    """Parse 'YYYY-MM-DD HH:MM:SS' by fixed character positions."""
+    if len(s) != 19 or s[4] != '-' or s[7] != '-' or s[10] != ' ' or s[13] != ':' or s[16] != ':':
+        raise ValueError(f"Not an ISO timestamp: {s}")
+    return datetime.datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]), int(s[17:19]))
+
+def _parse_us_fixed(s):
+    """Parse zero-padded 'MM/DD/YYYY HH:MM:SS' by fixed character positions."""
+    if len(s) != 19 or s[2] != '/' or s[5] != '/' or s[10] != ' ' or s[13] != ':' or s[16] != ':':
+        raise ValueError(f"Not a padded US timestamp: {s}")
+    return datetime.datetime(int(s[6:10]), int(s[0:2]), int(s[3:5]), int(s[11:13]), int(s[14:16]), int(s[17:19]))
+
+def _parse_us_split(s):
+    """Parse 'M/D/YYYY H:MM:SS' as Google Forms writes it, where month, day and hour are not padded."""
+    date_part, time_part = s.split(' ')
+    month, day, year = date_part.split('/')
+    hour, minute, second = time_part.split(':')
+    if len(year) != 4:
+        raise ValueError(f"Not a US timestamp: {s}")
+    return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+
+# Fast parsers for the layouts in TIMESTAMP_FORMATS, tried in this order when sniffing a column
+TIMESTAMP_FAST_PARSERS = [_parse_iso_fixed, _parse_us_fixed, _parse_us_split]
+
+def sniff_timestamp_parser(column):
+    """Return the fast parser that handles the most of a sample of the column's text cells, or None."""
+    sample = list(islice((value for value in column if isinstance(value, str) and value), TIMESTAMP_SNIFF_SAMPLE))
+    best_parser, best_hits = None, 0
+    for parser in TIMESTAMP_FAST_PARSERS:
+        hits = 0
+        for value in sample:
             try:
-                timestamp = datetime.datetime.strptime(timestamp_str, fmt)
-                break  # Break if parsing was successful
+                parser(value)
+                hits += 1
             except ValueError:
                 continue
+        if hits > best_hits:
+            best_parser, best_hits = parser, hits
+    return best_parser
 
+def sheet_now():
+    """Return the current time in SHEET_TIMEZONE as a naive datetime, comparable with parsed sheet timestamps."""
+    return datetime.datetime.now(SHEET_TIMEZONE).replace(tzinfo=None)
+
+def serial_to_datetime(serial):
+    """Convert a Sheets date-time serial number to a datetime."""
+    return SHEETS_EPOCH + datetime.timedelta(seconds=int(serial * 86400 + 0.5))
+
+def parse_timestamp_column(column):
+    """Convert a column of timestamps to datetimes, with None for unparseable cells.
+
+    Serial numbers are converted with plain arithmetic. Formatted strings go
+    through the fast parser sniffed for the column, and only outliers fall back
+    to parse_timestamp.
+    """
+    fast_parse = sniff_timestamp_parser(column)
+    timestamps = []
+    for value in column:
+        if isinstance(value, (int, float)):
+            timestamps.append(serial_to_datetime(value))
+            continue
+        timestamp = None
+        if fast_parse:
+            try:
+                timestamp = fast_parse(value)
+            except ValueError:
+                pass
         if not timestamp:
-            logging.warning(f"Failed to parse timestamp: {timestamp_str}")
-            return False  # Could not parse the timestamp
-
-        # Special case: Handle the 23:00 (11 PM) to 00:00 (midnight) range
-        if start_hour == 23 and end_hour == 0:
-            if timestamp.hour == 23 or timestamp.hour == 0:
-                return True
-        # Regular case
-        elif start_hour <= timestamp.hour < end_hour:
-            return True
-
-        return False
+            timestamp = parse_timestamp(value)  # Outliers take the general path
+        timestamps.append(timestamp)
+    return timestamps
+
+MINUTES_PER_DAY = 24 * 60
+
+def date_to_day(date):
+    """Convert a date to days since SHEETS_EPOCH."""
+    return date.toordinal() - SHEETS_EPOCH_ORDINAL
+
+def day_to_date(day):
+    """Convert days since SHEETS_EPOCH to a date."""
+    return datetime.date.fromordinal(day + SHEETS_EPOCH_ORDINAL)
+
+def datetime_to_minute(moment):
+    """Convert a datetime to minutes since SHEETS_EPOCH."""
+    return date_to_day(moment.date()) * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+OUTSIDE_SHIFT = -1  # Bucket index for times of day outside the shift window
+
+class ShiftBuckets:
+    """Non-overlapping, fixed-width time buckets covering a shift window that may cross midnight.
+
+    A booking's bucket is its minutes since the shift start divided by the
+    bucket width, looked up from a per-minute table, so every time of day
+    lands in at most one bucket in O(1).
+    """
+
+    def __init__(self, start, end, bucket_minutes):
+        self.start_minute = start.hour * 60 + start.minute
+        self.span_minutes = (end.hour * 60 + end.minute - self.start_minute) % MINUTES_PER_DAY or MINUTES_PER_DAY
+        self.bucket_minutes = bucket_minutes
+        self.count = -(-self.span_minutes // bucket_minutes)  # The last bucket is cut short at the shift end
+        self.bucket_by_minute = [self._bucket_of(minute) for minute in range(MINUTES_PER_DAY)]
+        self.bucket_by_minute_array = np.array(self.bucket_by_minute, dtype=np.int64)  # Same table, for whole-column lookups
+
+    def _bucket_of(self, minute_of_day):
+        offset = (minute_of_day - self.start_minute) % MINUTES_PER_DAY
+        return offset // self.bucket_minutes if offset < self.span_minutes else OUTSIDE_SHIFT
+
+    def bucket_of(self, minute_of_day):
+        """Return the bucket index for a minute of the day, or OUTSIDE_SHIFT."""
+        return self.bucket_by_minute[minute_of_day]
+
+    def interval(self, index):
+        """Return the (start, end) times of a bucket."""
+        start = self.start_minute + index * self.bucket_minutes
+        end = min(start + self.bucket_minutes, self.start_minute + self.span_minutes)
+        return (
+            datetime.time(start // 60 % 24, start % 60),
+            datetime.time(end // 60 % 24, end % 60),
+        )
+
+    def intervals(self):
+        """Return the (start, end) times of every bucket, in shift order."""
+        return [self.interval(index) for index in range(self.count)]
+
+    def next_bucket(self, moment):
+        """Return the index of the bucket after the one a datetime falls in; outside the shift, the first bucket."""
+        bucket = self.bucket_of(moment.hour * 60 + moment.minute)
+        return 0 if bucket == OUTSIDE_SHIFT else (bucket + 1) % self.count
+
+    def shift_day_of(self, day, minute_of_day):
+        """Return the day (since SHEETS_EPOCH) on which the shift containing a booking started."""
+        # Bookings after midnight belong to the shift that started the evening before
+        return day - 1 if minute_of_day < self.start_minute else day
+
+    def shift_date(self, moment):
+        """Return the operating date of the shift that a datetime falls in."""
+        return day_to_date(self.shift_day_of(date_to_day(moment.date()), moment.hour * 60 + moment.minute))
+
+# Buckets shown on the board
+BOARD_BUCKETS = ShiftBuckets(SHIFT_START, SHIFT_END, BUCKET_MINUTES)
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key so they share one in-flight result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn() for key, or wait for and share the result of an identical call already running."""
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _InFlightCall()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def running(self, key):
+        """Return whether a call for key is in flight."""
+        with self._lock:
+            return key in self._calls
+
+class SheetValuesCache:
+    """Thread-safe TTL cache of fetched sheet values, shared by every session in the process."""
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = {}  # (spreadsheet_id, range_name) -> (time the fetch started, values)
+        self._lock = threading.Lock()  # Guards the entries and counters only, never held while loading
+        self._loads = SingleFlight()  # One upstream read per key at a time
+
+    def get(self, key, loader, force_refresh=False):
+        """Return the cached values for key, calling loader() on a miss, expiry or forced refresh.
+
+        Concurrent misses for the same key share one loader() call. While it
+        runs, other callers are served the expired entry if one is held, and
+        if the loader fails the expired entry is served instead of failing. A
+        forced refresh is never served the expired entry and never shares a
+        load already running, since that load may predate the request; it runs
+        its own loader() call.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not force_refresh and time.monotonic() - entry[0] < self.ttl_seconds:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if force_refresh:
+            return self._load(key, loader, entry)
+        if entry and self._loads.running(key):
+            with self._lock:
+                self.stale_hits += 1
+            return entry[1]  # Another session is already refreshing this key
+        return self._loads.do(key, lambda: self._load(key, loader, entry))
+
+    def _load(self, key, loader, entry):
+        started_at = time.monotonic()
+        try:
+            values = loader()
+        except Exception as e:
+            if not entry:
+                raise
+            with self._lock:
+                self.stale_hits += 1
+            logging.warning(f"Sheet refresh failed ({e}); serving data cached {time.monotonic() - entry[0]:.0f}s ago.")
+            return entry[1]
+        with self._lock:
+            current = self._entries.get(key)
+            if current and current[0] > started_at:
+                pass  # A forced refresh that started later already stored newer values
+            elif values:
+                self._entries[key] = (started_at, values)  # Aged from the request, so the TTL never overstates freshness
+            else:
+                self._entries.pop(key, None)  # Never cache an empty response
+        return values
+
+    def invalidate(self, key=None):
+        """Drop one cached entry, or every entry if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters for display and logging."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stale_hits': self.stale_hits,
+                'entries': len(self._entries),
+            }
+
+@st.cache_resource
+def get_sheet_values_cache():
+    """Return the process-wide sheet values cache (survives reruns and is shared by all sessions)."""
+    return SheetValuesCache(SHEET_CACHE_TTL_SECONDS)
+
+class TokenBucket:
+    """Thread-safe token bucket that spaces out API calls to stay within a per-minute quota."""
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+@st.cache_resource
+def get_sheets_rate_limiter():
+    """Return the process-wide token bucket sized to the service account's Sheets read quota."""
+    return TokenBucket(SHEETS_READ_QUOTA_PER_MINUTE / 60, RATE_LIMIT_BURST)
+
+def retry_delay(attempt, retry_after=None):
+    """Return a full-jitter exponential backoff delay, honouring any Retry-After header."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+    if retry_after and str(retry_after).isdigit():
+        delay = max(delay, int(retry_after))
+    return delay
+
+@st.cache_resource
+def load_sheets_discovery_document():
+    """Parse the pinned Sheets discovery document once per process."""
+    with open(SHEETS_DISCOVERY_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+class SheetsClient:
+    """Long-lived Sheets client: one credential and service object, and a process-wide pool of keep-alive HTTP transports.
+
+    httplib2 connections are not thread-safe, so each request borrows an
+    AuthorizedHttp from the pool and returns it afterwards. Streamlit runs every
+    rerun on a new thread, so the pool, not the thread, owns the connections and
+    a rerun reuses an open TLS connection. The shared access token is refreshed
+    ahead of expiry so no request has to wait on a token round trip.
+    """
+
+    def __init__(self, credentials=None, api_endpoint=None, rate_limiter=None):
+        self.credentials = credentials or authenticate_service_account()
+        self.rate_limiter = rate_limiter
+        self._single_flight = SingleFlight()
+        client_options = {'api_endpoint': api_endpoint} if api_endpoint else None
+        self.service = build_from_document(
+            load_sheets_discovery_document(), credentials=self.credentials, client_options=client_options
+        )
+        self._pool = queue.LifoQueue(maxsize=HTTP_POOL_SIZE)  # Idle transports; the most recently used is likeliest still open
+        self._token_lock = threading.Lock()
+
+    def borrow_http(self):
+        """Take an idle authorized HTTP transport from the pool, or open a new one if none is idle."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+
+    def return_http(self, http):
+        """Put a transport back in the pool for the next request, dropping it if the pool is full."""
+        try:
+            self._pool.put_nowait(http)
+        except queue.Full:
+            pass
+
+    def _refresh_token_if_needed(self):
+        if isinstance(self.credentials, AnonymousCredentials):
+            return  # Fake Sheets API servers take unauthenticated requests
+        with self._token_lock:
+            expiry = self.credentials.expiry  # Naive UTC, as stored by google-auth
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            if self.credentials.token and expiry and expiry - now > datetime.timedelta(seconds=TOKEN_REFRESH_MARGIN_SECONDS):
+                return
+            http = self.borrow_http()
+            self.credentials.refresh(google_auth_httplib2.Request(http.http))
+            self.return_http(http)
+            logging.info("Refreshed Google Sheets access token.")
+
+    def _execute_with_retry(self, request):
+        for attempt in range(MAX_FETCH_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            self._refresh_token_if_needed()
+            http = self.borrow_http()
+            try:
+                response = request.execute(http=http)
+                self.return_http(http)
+                return response
+            except HttpError as e:
+                self.return_http(http)  # The server answered, so the connection is still good
+                if e.resp.status not in RETRYABLE_STATUS_CODES or attempt == MAX_FETCH_RETRIES:
+                    raise
+                delay = retry_delay(attempt, e.resp.get('retry-after'))
+            except (httplib2.HttpLib2Error, TransportError, OSError):  # OSError covers DNS failures, resets and timeouts
+                # The transport is dropped rather than returned, so a broken connection is not handed out again
+                if attempt == MAX_FETCH_RETRIES:
+                    raise
+                delay = retry_delay(attempt)
+            logging.warning(f"Sheets API request failed (attempt {attempt + 1}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+    def execute(self, request):
+        """Execute an API request over a pooled keep-alive connection.
+
+        Calls are rate limited, retried on 429/5xx with jittered backoff, and
+        identical concurrent requests share a single in-flight call.
+        """
+        return self._single_flight.do((request.method, request.uri), lambda: self._execute_with_retry(request))
+
+@st.cache_resource
+def get_sheets_client():
+    """Return the process-wide Sheets client shared by every rerun and session."""
+    return SheetsClient(rate_limiter=get_sheets_rate_limiter())
+
+MISSING_DESTINATION = -1  # Destination code for rows with an empty destination cell
+
+class DestinationLabels:
+    """Dictionary encoding of raw destination strings as small integer codes."""
+
+    def __init__(self):
+        self.labels = []
+        self._codes = {}
+
+    def encode(self, label):
+        """Return the code for label, assigning the next free code to labels not seen before."""
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self._codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def code_of(self, label):
+        """Return the code for label without assigning one, or None if it has not been seen."""
+        return self._codes.get(label)
+
+    def decode(self, code):
+        """Return the raw label for a code, or None for a missing destination."""
+        return self.labels[code] if code != MISSING_DESTINATION else None
+
+    def __len__(self):
+        return len(self.labels)
+
+class SheetColumns:
+    """Column-major block of sheet rows: a timestamp column plus an integer-coded destination column."""
+
+    def __init__(self, labels, timestamps=None, destination_codes=None):
+        self.labels = labels
+        self.timestamps = timestamps if timestamps is not None else []
+        self.destination_codes = destination_codes if destination_codes is not None else array('i')
+
+    @classmethod
+    def from_value_range(cls, columns, labels):
+        """Build a block from a majorDimension=COLUMNS response of [timestamps, destinations]."""
+        block = cls(labels)
+        timestamp_column = columns[0] if columns else []
+        destination_column = columns[1] if len(columns) > 1 else []
+        row_count = max(len(timestamp_column), len(destination_column))
+
+        # The API trims each column's trailing blanks independently, so pad both to the same length
+        block.timestamps.extend(timestamp_column)
+        block.timestamps.extend([''] * (row_count - len(timestamp_column)))
+        encode = labels.encode
+        block.destination_codes.extend(
+            encode(str(destination)) if destination != '' else MISSING_DESTINATION
+            for destination in destination_column
+        )
+        block.destination_codes.extend([MISSING_DESTINATION] * (row_count - len(destination_column)))
+        return block
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def extend(self, other):
+        """Append the rows of another block encoded with the same labels."""
+        self.timestamps.extend(other.timestamps)
+        self.destination_codes.extend(other.destination_codes)
+
+    def pad(self, row_count):
+        """Append blank rows until the block holds row_count rows."""
+        missing = row_count - len(self)
+        self.timestamps.extend([''] * missing)
+        self.destination_codes.extend([MISSING_DESTINATION] * missing)
+
+    def row(self, index):
+        """Return one row as a (timestamp, destination) pair."""
+        return self.timestamps[index], self.labels.decode(self.destination_codes[index])
+
+    def tail(self, start):
+        """Return the rows from start onwards as a new block."""
+        return SheetColumns(self.labels, self.timestamps[start:], self.destination_codes[start:])
+
+class GoogleSheetsSource:
+    """Data source backed by the Sheets API, either live Google or a FakeSheetsServer."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def fetch_range(self, range_name, major_dimension='ROWS', value_render_option='FORMATTED_VALUE',
+                    date_time_render_option='SERIAL_NUMBER'):
+        """Return the ``values`` of a range with a single ``spreadsheets.values.get`` call."""
+        request = self.client.service.spreadsheets().values().get(
+            spreadsheetId=SPREADSHEET_ID,
+            range=range_name,
+            majorDimension=major_dimension,
+            valueRenderOption=value_render_option,
+            dateTimeRenderOption=date_time_render_option,
+        )
+        return self.client.execute(request).get('values', [])
+
+@st.cache_resource
+def get_data_source():
+    """Return the process-wide data source selected by DATA_SOURCE."""
+    if DATA_SOURCE == 'google':
+        return GoogleSheetsSource(get_sheets_client())
+    if DATA_SOURCE == 'local':
+        return LocalFileSource(LOCAL_DATA_PATH)
+    if DATA_SOURCE == 'fake':
+        rows = load_rows(LOCAL_DATA_PATH) if os.path.exists(LOCAL_DATA_PATH) else generate_rows(FAKE_SHEET_ROWS)
+        server = FakeSheetsServer(rows).start()
+        client = SheetsClient(credentials=AnonymousCredentials(), api_endpoint=server.url, rate_limiter=get_sheets_rate_limiter())
+        return GoogleSheetsSource(client)
+    raise ValueError(f"Unknown data source: {DATA_SOURCE}")
+
+def download_sheet_values(range_name=RANGE_NAME):
+    """Download a sheet range column-major with a single call, as [timestamps, destinations]."""
+    params = {'major_dimension': 'COLUMNS'}
+    if SERIAL_TIMESTAMPS:
+        params.update(value_render_option='UNFORMATTED_VALUE', date_time_render_option='SERIAL_NUMBER')
+    columns = get_data_source().fetch_range(range_name, **params)
+    row_count = max((len(column) for column in columns), default=0)
+    logging.info(f"Fetched {row_count} rows from {range_name}.")  # Logging the output instead of displaying it
+    return columns
+
+def iter_sheet_pages(fetch_range, labels, first_row=1, page_size=SHEET_PAGE_SIZE):
+    """Yield the sheet as SheetColumns in fixed-size row windows starting at first_row, until a window comes back empty.
+
+    The API trims blank rows at the end of every window, so a short window
+    does not mean the sheet has ended. Each window is yielded once the next
+    one has been fetched; if that one holds data, the short window is padded
+    back with blank rows so row positions stay aligned with the sheet.
+    """
+    def fetch(start):
+        return SheetColumns.from_value_range(fetch_range(f"{SHEET_NAME}!A{start}:B{start + page_size - 1}"), labels)
+
+    start = first_row
+    page = fetch(start)
+    while page:
+        start += page_size
+        next_page = fetch(start)
+        if next_page:
+            page.pad(page_size)  # Rows cleared at the end of this window
+        yield page
+        page = next_page
+
+def download_all_sheet_values():
+    """Download every row of the PRIORITY sheet into one SheetColumns, one page at a time."""
+    values = SheetColumns(DestinationLabels())
+    for page in iter_sheet_pages(download_sheet_values, values.labels):
+        values.extend(page)
+    return values
+
+class ParseStats:
+    """Counts of sheet rows that could not be used in one refresh, plus a few sample bad rows."""
+
+    def __init__(self):
+        self.rows = 0  # Sheet rows read, including the ones that were skipped
+        self.short_rows = 0  # No destination
+        self.unparseable_rows = 0  # Timestamp in no known format
+        self.skipped_rows = 0  # Outside every interval on the board
+        self.samples = []
+
+    def add_sample(self, row):
+        if len(self.samples) < PARSE_ERROR_SAMPLE_SIZE:
+            self.samples.append(row)
+
+    def merge(self, other):
+        """Add another block's counts and samples into this one."""
+        self.rows += other.rows
+        self.short_rows += other.short_rows
+        self.unparseable_rows += other.unparseable_rows
+        self.skipped_rows += other.skipped_rows
+        for row in other.samples:
+            self.add_sample(row)
+
+    def log_summary(self, context):
+        """Log one summary line for the refresh, as a warning if any rows were unusable."""
+        bad_rows = self.short_rows + self.unparseable_rows
+        message = (
+            f"{context}: {self.rows} rows, {self.short_rows} short, {self.unparseable_rows} unparseable, "
+            f"{self.skipped_rows} outside the board's hours"
+        )
+        if self.samples:
+            message += f"; sample bad rows: {self.samples}"
+        logging.log(logging.WARNING if bad_rows else logging.INFO, message)
+
+class BookingRecords:
+    """Typed, column-major table of bookings, one entry per usable sheet row.
+
+    Every cell is parsed exactly once on the way in; filters, rankings and
+    revenue totals read the typed columns instead of the raw strings. Clean
+    destination names are dictionary-encoded into the shared destinations
+    table and only decoded when rendering.
+    """
+
+    def __init__(self, destinations):
+        self.destinations = destinations  # DestinationLabels of clean destination names
+        self.timestamps = []
+        self.minutes = array('h')  # Minute of the day
+        self.days = array('i')  # Days since SHEETS_EPOCH
+        self.destination_codes = array('i')
+        self.prices = array('i')
+        self.stats = ParseStats()
+
+    @classmethod
+    def from_columns(cls, destinations, timestamps, minutes, days, destination_codes, prices, stats):
+        """Build a table from already-parsed columns (lists, arrays or NumPy arrays)."""
+        records = cls(destinations)
+        records.timestamps = timestamps
+        records.minutes = minutes
+        records.days = days
+        records.destination_codes = destination_codes
+        records.prices = prices
+        records.stats = stats
+        return records
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp, destination_code, price):
+        self.timestamps.append(timestamp)
+        self.minutes.append(timestamp.hour * 60 + timestamp.minute)
+        self.days.append(timestamp.toordinal() - SHEETS_EPOCH_ORDINAL)
+        self.destination_codes.append(destination_code)
+        self.prices.append(price)
+
+def encode_destination_labels(labels, destinations):
+    """Map every raw label code to (clean destination code, price), encoding clean names into destinations."""
+    clean_codes = []
+    prices = []
+    for label in labels.labels:
+        clean_dest, price = parse_destination(label)
+        clean_codes.append(destinations.encode(clean_dest))
+        prices.append(price)
+    return clean_codes, prices
+
+def parse_bookings_rowwise(block, destinations):
+    """Turn a SheetColumns block of data rows into typed BookingRecords, one row at a time."""
+    records = BookingRecords(destinations)
+    stats = records.stats
+    stats.rows = len(block)
+    clean_codes, prices = encode_destination_labels(block.labels, destinations)
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)  # Only format per-row messages when they will be shown
+
+    # Convert the whole timestamp column up front; serial numbers need only arithmetic
+    timestamps = parse_timestamp_column(block.timestamps)
+
+    for index, (timestamp, code) in enumerate(zip(timestamps, block.destination_codes)):
+        if code == MISSING_DESTINATION:
+            stats.short_rows += 1  # Skip any incomplete rows
+            stats.add_sample(block.row(index))
+            continue
+
+        # Log the processing of the row in the background
+        if debug:
+            logging.debug(f"Processing row: Timestamp: {timestamp}, Destination: {block.labels.decode(code)}")
+
+        if timestamp is None:
+            stats.unparseable_rows += 1  # Could not parse the timestamp
+            stats.add_sample(block.row(index))
+            continue
+
+        records.append(timestamp, clean_codes[code], prices[code])
+
+    return records
+
+def serials_to_datetime64(serials):
+    """Convert an array of Sheets date-time serial numbers to datetime64[s] with plain arithmetic."""
+    seconds = np.rint(np.asarray(serials, dtype=np.float64) * 86400).astype(np.int64)
+    return np.datetime64(SHEETS_EPOCH, 's') + seconds.astype('timedelta64[s]')
+
+def parse_fixed_width_timestamps(texts, layout):
+    """Vectorized fixed-position parse of 19-character timestamps, with NaT where a cell does not fit the layout."""
+    count = len(texts)
+    result = np.full(count, np.datetime64('NaT'), dtype='datetime64[s]')
+    if not count:
+        return result
+
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=count)
+    chars = np.array(texts, dtype='U19').view(np.uint32).reshape(count, 19).astype(np.int64)
+
+    separators = {**layout['separators'], 10: ' ', 13: ':', 16: ':'}
+    digit_positions = [position for position in range(19) if position not in separators]
+    digits = chars[:, digit_positions] - ord('0')
+    fits = (lengths == 19) & ((digits >= 0) & (digits <= 9)).all(axis=1)
+    for position, separator in separators.items():
+        fits &= chars[:, position] == ord(separator)
+
+    def number(span):
+        value = np.zeros(count, dtype=np.int64)
+        for position in range(*span):
+            value = value * 10 + chars[:, position] - ord('0')
+        return value
+
+    year, month, day = number(layout['year']), number(layout['month']), number(layout['day'])
+    hour, minute, second = number((11, 13)), number((14, 16)), number((17, 19))
+    fits &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (hour < 24) & (minute < 60) & (second < 60)
+
+    index = np.flatnonzero(fits)
+    months = ((year[index] - 1970) * 12 + month[index] - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day[index] - 1).astype('timedelta64[D]')
+    real_dates = dates.astype('datetime64[M]') == months  # Rejects days past the end of the month
+    seconds = (hour * 3600 + minute * 60 + second)[index].astype('timedelta64[s]')
+    result[index[real_dates]] = (dates.astype('datetime64[s]') + seconds)[real_dates]
+    return result
+
+# Character positions of the zero-padded layouts in TIMESTAMP_FORMATS; the time always sits at 11-19
+FIXED_WIDTH_LAYOUTS = [
+    {'year': (0, 4), 'month': (5, 7), 'day': (8, 10), 'separators': {4: '-', 7: '-'}},  # YYYY-MM-DD HH:MM:SS
+    {'year': (6, 10), 'month': (0, 2), 'day': (3, 5), 'separators': {2: '/', 5: '/'}},  # MM/DD/YYYY HH:MM:SS
+]
+
+def parse_timestamp_column_vectorized(column):
+    """Convert a column of serial numbers and/or formatted strings to datetime64[s], with NaT for bad cells."""
+    try:
+        return serials_to_datetime64(column)  # Fast path: every cell is a serial number
+    except (TypeError, ValueError):
+        pass
+
+    raw = np.empty(len(column), dtype=object)
+    raw[:] = column
+    is_text = np.fromiter(map(isinstance, column, repeat(str)), dtype=bool, count=len(column))
+    timestamps = np.full(len(column), np.datetime64('NaT'), dtype='datetime64[s]')
+    if (~is_text).any():
+        timestamps[~is_text] = serials_to_datetime64(raw[~is_text].astype(np.float64))
+
+    text_index = np.flatnonzero(is_text)
+    texts = raw[text_index]
+    parsed = np.full(len(texts), np.datetime64('NaT'), dtype='datetime64[s]')
+
+    # Try the layout that fits most of a sample first, so a uniform column is parsed in one pass
+    sample = texts[:TIMESTAMP_SNIFF_SAMPLE].tolist()
+    layouts = sorted(
+        FIXED_WIDTH_LAYOUTS,
+        key=lambda layout: np.isnat(parse_fixed_width_timestamps(sample, layout)).sum(),
+    )
+    for layout in layouts:
+        missing = np.flatnonzero(np.isnat(parsed))
+        if not len(missing):
+            break
+        parsed[missing] = parse_fixed_width_timestamps(texts[missing].tolist(), layout)
+
+    # Unpadded or otherwise irregular cells go through pandas with each explicit format
+    for fmt in TIMESTAMP_FORMATS:
+        missing = np.flatnonzero(np.isnat(parsed))
+        if not len(missing):
+            break
+        fallback = pd.to_datetime(pd.Series(texts[missing]), format=fmt, errors='coerce')
+        parsed[missing] = fallback.to_numpy(dtype='datetime64[s]')
+    timestamps[text_index] = parsed
+    return timestamps
+
+def parse_bookings_vectorized(block, destinations):
+    """Turn a SheetColumns block of data rows into typed BookingRecords with whole-column operations."""
+    timestamps = parse_timestamp_column_vectorized(block.timestamps)
+    codes = np.frombuffer(block.destination_codes, dtype=np.int32) if len(block) else np.empty(0, dtype=np.int32)
+
+    # Skip incomplete rows and rows whose timestamp could not be parsed
+    short = codes == MISSING_DESTINATION
+    unparseable = np.isnat(timestamps) & ~short
+    stats = ParseStats()
+    stats.rows = len(block)
+    stats.short_rows = int(short.sum())
+    stats.unparseable_rows = int(unparseable.sum())
+    for index in np.flatnonzero(short | unparseable)[:PARSE_ERROR_SAMPLE_SIZE]:
+        stats.add_sample(block.row(int(index)))
+
+    valid = ~(short | unparseable)
+    timestamps = timestamps[valid]
+    codes = codes[valid]
+
+    clean_codes, prices = encode_destination_labels(block.labels, destinations)
+    days = timestamps.astype('datetime64[D]') - np.datetime64(SHEETS_EPOCH.date(), 'D')
+    minutes = timestamps.astype(np.int64) // 60 % MINUTES_PER_DAY
+    return BookingRecords.from_columns(
+        destinations=destinations,
+        timestamps=timestamps,
+        minutes=minutes.astype(np.int16),
+        days=days.astype(np.int32),
+        destination_codes=np.asarray(clean_codes, dtype=np.int32)[codes],
+        prices=np.asarray(prices, dtype=np.int32)[codes],
+        stats=stats,
+    )
+
+def parse_bookings(block, destinations):
+    """Turn a SheetColumns block of data rows (header excluded) into typed BookingRecords.
+
+    Clean destination names are encoded into destinations, a DestinationLabels
+    shared by every block that feeds the same aggregates.
+    """
+    if VECTORIZED_PARSING:
+        return parse_bookings_vectorized(block, destinations)
+    return parse_bookings_rowwise(block, destinations)
+
+def load_booking_records():
+    """Download every row of the PRIORITY sheet and parse it into BookingRecords."""
+    return parse_bookings(download_all_sheet_values().tail(1), DestinationLabels())
+
+class ShiftPartition:
+    """Passenger counts and revenue per bucket and destination for one operating shift."""
+
+    def __init__(self, bucket_count):
+        self.passenger_counts = [[] for _ in range(bucket_count)]  # Bucket index -> count per destination code
+        self.destination_revenue = [[] for _ in range(bucket_count)]  # Bucket index -> summed fares per destination code
+        self.rows = 0
+
+    def add_cells(self, counts, revenue, rows):
+        """Add bucket x destination count and revenue matrices (nested lists) to the partition."""
+        for cells, additions in ((self.passenger_counts, counts), (self.destination_revenue, revenue)):
+            for row, added in zip(cells, additions):
+                for code, value in enumerate(added):
+                    if value:
+                        row[code] += value
+        self.rows += rows
+
+    def grow(self, size):
+        """Make room for destination codes assigned since the partition was last touched."""
+        if self.passenger_counts and len(self.passenger_counts[0]) >= size:
+            return
+        for cells in (self.passenger_counts, self.destination_revenue):
+            for row in cells:
+                row.extend([0] * (size - len(row)))
+
+class AggregateCube:
+    """Materialized passenger counts and revenue keyed by (shift date, bucket, destination).
+
+    Each operating shift (e.g. 23:00 - 07:00, dated by the evening it starts)
+    is a ShiftPartition indexed by shift day, holding dense per-bucket lists
+    indexed by destination code. New bookings are folded in place, and every
+    ranking, total or series is read from the cells it covers rather than the
+    rows behind them; labels are decoded only on the way out.
+    """
+
+    def __init__(self, buckets, destinations):
+        self.buckets = buckets
+        self.intervals = buckets.intervals()
+        self.destinations = destinations  # DestinationLabels shared with the parsed bookings
+        self.shifts = {}  # Shift day (since SHEETS_EPOCH) -> ShiftPartition
+        self.rows_seen = 0
+
+    def __len__(self):
+        return self.rows_seen  # Data rows folded in, so a cube built from an empty sheet is falsy
+
+    def _partition(self, shift_day):
+        partition = self.shifts.get(shift_day)
+        if partition is None:
+            partition = self.shifts[shift_day] = ShiftPartition(self.buckets.count)
+        partition.grow(len(self.destinations))
+        return partition
+
+    def add_bookings(self, records):
+        """Fold typed BookingRecords into the cube and return how many fell outside the shift."""
+        self.rows_seen += records.stats.rows
+        if VECTORIZED_AGGREGATION:
+            return self._add_bookings_vectorized(records)
+        return self._add_bookings_rowwise(records)
+
+    def _add_bookings_vectorized(self, records):
+        minutes = np.asarray(records.minutes, dtype=np.int64)
+        buckets = self.buckets.bucket_by_minute_array[minutes]
+        inside = buckets != OUTSIDE_SHIFT
+        skipped = len(buckets) - int(inside.sum())
+        if skipped == len(buckets):
+            return skipped
+
+        minutes = minutes[inside]
+        buckets = buckets[inside]
+        codes = np.asarray(records.destination_codes, dtype=np.int64)[inside]
+        prices = np.asarray(records.prices, dtype=np.int64)[inside]
+        # Bookings after midnight belong to the shift that started the evening before
+        shift_days = np.asarray(records.days, dtype=np.int64)[inside] - (minutes < self.buckets.start_minute)
+        shift_list, shift_index = np.unique(shift_days, return_inverse=True)
+
+        # One flat cell index per booking, so a single bincount fills every (shift, bucket, destination) cell
+        shape = (len(shift_list), self.buckets.count, len(self.destinations))
+        cells = (shift_index * shape[1] + buckets) * shape[2] + codes
+        size = shape[0] * shape[1] * shape[2]
+        counts = np.bincount(cells, minlength=size).reshape(shape)
+        revenue = np.rint(np.bincount(cells, weights=prices, minlength=size)).astype(np.int64).reshape(shape)
+        rows = counts.sum(axis=(1, 2)).tolist()
+
+        for shift_day, shift_counts, shift_revenue, shift_rows in zip(shift_list.tolist(), counts.tolist(), revenue.tolist(), rows):
+            partition = self.shifts.get(shift_day)
+            if partition is None:
+                # A shift first seen in this batch takes the matrices as they are
+                partition = self.shifts[shift_day] = ShiftPartition(self.buckets.count)
+                partition.passenger_counts, partition.destination_revenue = shift_counts, shift_revenue
+                partition.rows = shift_rows
+            else:
+                partition.grow(len(self.destinations))
+                partition.add_cells(shift_counts, shift_revenue, shift_rows)
+        return skipped
+
+    def _add_bookings_rowwise(self, records):
+        skipped = 0
+        bucket_by_minute = self.buckets.bucket_by_minute
+        shift_day_of = self.buckets.shift_day_of
+        current_day, partition = None, None
+        rows = zip(records.days.tolist(), records.minutes.tolist(), records.destination_codes.tolist(), records.prices.tolist())
+        for day, minute, code, price in rows:
+            bucket = bucket_by_minute[minute]
+            if bucket == OUTSIDE_SHIFT:
+                skipped += 1  # Not in any of the shift's buckets
+                continue
+
+            # Rows arrive in time order, so the partition only changes when a new shift starts
+            shift_day = shift_day_of(day, minute)
+            if shift_day != current_day:
+                current_day, partition = shift_day, self._partition(shift_day)
+
+            partition.passenger_counts[bucket][code] += 1
+            partition.destination_revenue[bucket][code] += price  # Each booking adds the fare it was made at
+            partition.rows += 1
+        return skipped
+
+    def latest_shift_date(self):
+        """Return the date of the most recent shift with bookings, or None."""
+        return day_to_date(max(self.shifts)) if self.shifts else None
+
+    def _shift_days(self, start_date, end_date):
+        first, last = date_to_day(start_date), date_to_day(end_date)
+        return [day for day in sorted(self.shifts) if first <= day <= last]
+
+    def ranking(self, shift_date, bucket_indexes):
+        """Rank destinations over some buckets of one shift and return (ranked_destinations, destination_revenue)."""
+        partition = self.shifts.get(date_to_day(shift_date))
+        if partition is None:
+            return [], {}
+
+        counts = {}
+        revenue = {}
+        for bucket in bucket_indexes:
+            bucket_revenue = partition.destination_revenue[bucket]
+            for code, count in enumerate(partition.passenger_counts[bucket]):
+                if count:
+                    counts[code] = counts.get(code, 0) + count
+                    revenue[code] = revenue.get(code, 0) + bucket_revenue[code]
+
+        decode = self.destinations.decode
+        ranked_destinations = sorted(((decode(code), count) for code, count in counts.items()), key=itemgetter(1), reverse=True)
+        return ranked_destinations, {decode(code): amount for code, amount in revenue.items()}
+
+    def rankings(self, shift_date):
+        """Return a dict mapping each bucket's (start, end) interval to a (ranked_destinations, destination_revenue) pair for one shift."""
+        return {interval: self.ranking(shift_date, [index]) for index, interval in enumerate(self.intervals)}
+
+    def bucket_totals(self, shift_date):
+        """Return a (passengers, revenue) pair per bucket of one shift."""
+        partition = self.shifts.get(date_to_day(shift_date))
+        if partition is None:
+            return [(0, 0)] * self.buckets.count
+        return [
+            (sum(counts), sum(revenue))
+            for counts, revenue in zip(partition.passenger_counts, partition.destination_revenue)
+        ]
+
+    def shift_total(self, shift_date):
+        """Return the (passengers, revenue) pair for a whole shift."""
+        totals = self.bucket_totals(shift_date)
+        return sum(count for count, _ in totals), sum(revenue for _, revenue in totals)
+
+    def bucket_series(self, bucket, start_date, end_date):
+        """Return (shift_date, passengers, revenue) for one bucket across the shifts in a date range, such as 02:00 every night of a week."""
+        series = []
+        for day in self._shift_days(start_date, end_date):
+            partition = self.shifts[day]
+            series.append((day_to_date(day), sum(partition.passenger_counts[bucket]), sum(partition.destination_revenue[bucket])))
+        return series
+
+    def destination_series(self, destination, start_date, end_date):
+        """Return (shift_date, passengers, revenue) for one destination across the shifts in a date range."""
+        code = self.destinations.code_of(destination)
+        series = []
+        for day in self._shift_days(start_date, end_date):
+            partition = self.shifts[day]
+            if code is None or code >= len(partition.passenger_counts[0]):
+                series.append((day_to_date(day), 0, 0))
+                continue
+            series.append((
+                day_to_date(day),
+                sum(counts[code] for counts in partition.passenger_counts),
+                sum(revenue[code] for revenue in partition.destination_revenue),
+            ))
+        return series
+
+class LiveDemandWindow:
+    """Rolling per-destination passenger counts over the last few minutes, kept in a ring buffer.
+
+    The buffer has one slot of per-destination counts per minute of the
+    longest window, and a running total is kept for every window. Moving the
+    clock forward subtracts the minutes that fall out of each window and
+    clears their slots, so each booking and each elapsed minute costs a
+    constant amount of work however long the sheet gets.
+    """
+
+    def __init__(self, destinations, windows=LIVE_WINDOWS_MINUTES):
+        self.destinations = destinations  # DestinationLabels shared with the parsed bookings
+        self.windows = windows
+        self.size = max(windows)
+        self.slots = [[] for _ in range(self.size)]  # Minute % size -> count per destination code
+        self.totals = {window: [] for window in windows}  # Window -> count per destination code within it
+        self.head = None  # Latest minute (since SHEETS_EPOCH) the buffer has advanced to
+
+    def _grow(self):
+        # Make room for destination codes assigned since the last fold
+        size = len(self.destinations)
+        for counts in self.slots + list(self.totals.values()):
+            counts.extend([0] * (size - len(counts)))
+
+    def _clear(self):
+        for counts in self.slots + list(self.totals.values()):
+            counts[:] = [0] * len(counts)
+
+    def advance(self, minute):
+        """Move the window's end forward to minute (since SHEETS_EPOCH), dropping bookings that have aged out."""
+        if self.head is not None and minute <= self.head:
+            return
+        if self.head is None or minute - self.head >= self.size:
+            self._clear()  # Everything in the buffer has aged out
+            self.head = minute
+            return
+
+        for current in range(self.head + 1, minute + 1):
+            for window, totals in self.totals.items():
+                leaving = self.slots[(current - window) % self.size]
+                for code, count in enumerate(leaving):
+                    if count:
+                        totals[code] -= count
+            slot = self.slots[current % self.size]
+            slot[:] = [0] * len(slot)
+        self.head = minute
+
+    def add(self, minute, code):
+        """Count one booking made at minute (since SHEETS_EPOCH) for a destination code."""
+        self.advance(minute)
+        age = self.head - minute
+        if age >= self.size:
+            return  # Too old for any window
+        self.slots[minute % self.size][code] += 1
+        for window, totals in self.totals.items():
+            if age < window:
+                totals[code] += 1
+
+    def add_bookings(self, records):
+        """Fold typed BookingRecords into the windows."""
+        self._grow()
+        minutes = np.asarray(records.days, dtype=np.int64) * MINUTES_PER_DAY + np.asarray(records.minutes, dtype=np.int64)
+        if not len(minutes):
+            return
+
+        # Only bookings from the newest minutes can still be inside a window
+        latest = int(minutes.max())
+        cutoff = max(latest, self.head if self.head is not None else latest) - self.size
+        recent = minutes > cutoff
+        codes = np.asarray(records.destination_codes, dtype=np.int64)[recent]
+        for minute, code in zip(minutes[recent].tolist(), codes.tolist()):
+            self.add(minute, code)
+
+    def counts(self, window):
+        """Return (destination, passengers) pairs booked in the last window minutes, busiest first."""
+        decode = self.destinations.decode
+        ranked = ((decode(code), count) for code, count in enumerate(self.totals[window]) if count)
+        return sorted(ranked, key=itemgetter(1), reverse=True)
+
+    def snapshot(self, now):
+        """Advance to now and return a dict mapping each window length to its counts()."""
+        self.advance(datetime_to_minute(now))
+        return {window: self.counts(window) for window in self.windows}
+
+class DemandBaselines:
+    """Running mean and variance of passengers per (weekday, bucket, destination) over closed shifts.
+
+    Each closed shift contributes one observation per bucket and destination,
+    zero included, folded in with Welford's update so the history is never
+    rescanned. A destination first seen after some shifts closed is backfilled
+    with zeros for them, so incremental syncs and full resyncs agree. Looking up
+    a cell's usual demand is O(1).
+    """
+
+    def __init__(self, destinations):
+        self.destinations = destinations  # DestinationLabels shared with the cube
+        # (weekday, bucket index) -> per destination code observation counts, means and sums of squared deviations
+        self.observations = {}
+        self.means = {}
+        self.squares = {}
+        self.shifts_closed = {}  # (weekday, bucket index) -> closed shifts folded in
+        self.closed_through = None  # Latest shift day folded in
+
+    def _add_shift(self, weekday, partition):
+        size = len(self.destinations)
+        for bucket, counts in enumerate(partition.passenger_counts):
+            key = (weekday, bucket)
+            observations = self.observations.setdefault(key, [])
+            means = self.means.setdefault(key, [])
+            squares = self.squares.setdefault(key, [])
+            # Destinations encoded since the last shift closed had zero passengers in every earlier one
+            observations.extend([self.shifts_closed.get(key, 0)] * (size - len(observations)))
+            for cells in (means, squares):
+                cells.extend([0] * (size - len(cells)))
+            self.shifts_closed[key] = self.shifts_closed.get(key, 0) + 1
+            for code in range(size):
+                count = counts[code] if code < len(counts) else 0
+                observations[code] += 1
+                delta = count - means[code]
+                means[code] += delta / observations[code]
+                squares[code] += delta * (count - means[code])
+
+    def close_shifts(self, cube):
+        """Fold every shift older than the cube's latest one into the baselines, each exactly once."""
+        if not cube.shifts:
+            return
+        latest = max(cube.shifts)
+        for day in sorted(cube.shifts):
+            if day >= latest:
+                break  # The latest shift may still be running
+            if self.closed_through is not None and day <= self.closed_through:
+                continue
+            self._add_shift(day_to_date(day).weekday(), cube.shifts[day])
+            self.closed_through = day
+
+    def usual(self, weekday, bucket, destination):
+        """Return (mean, standard deviation) of passengers for a cell, or None until BASELINE_MIN_SHIFTS shifts have closed."""
+        code = self.destinations.code_of(destination)
+        observations = self.observations.get((weekday, bucket))
+        if code is None or observations is None or code >= len(observations) or observations[code] < BASELINE_MIN_SHIFTS:
+            return None
+        n = observations[code]
+        return self.means[(weekday, bucket)][code], (self.squares[(weekday, bucket)][code] / (n - 1)) ** 0.5
+
+class DemandForecaster:
+    """Next-bucket passenger forecasts from seasonal exponential smoothing of closed buckets.
+
+    Every bucket of the shift keeps its own smoothed level per destination,
+    since 02:00 demand follows earlier 02:00s rather than 01:00. A bucket is
+    folded in once it closes, i.e. once a later bucket has bookings, so
+    forecasting is a lookup and nothing is refit on a rerun.
+    """
+
+    def __init__(self, buckets, destinations, smoothing=FORECAST_SMOOTHING):
+        self.buckets = buckets
+        self.destinations = destinations  # DestinationLabels shared with the cube
+        self.smoothing = smoothing
+        self.levels = [[] for _ in range(buckets.count)]  # Bucket index -> smoothed passengers per destination code
+        self.shifts_seen = [0] * buckets.count  # Bucket index -> closed shifts folded in
+        self.closed_through = None  # (shift day, bucket index) of the latest bucket folded in
+
+    def _fold(self, bucket, counts):
+        size = len(self.destinations)
+        levels = self.levels[bucket]
+        levels.extend([0.0] * (size - len(levels)))
+        first = self.shifts_seen[bucket] == 0
+        for code in range(size):
+            count = counts[code] if code < len(counts) else 0
+            levels[code] = count if first else levels[code] + self.smoothing * (count - levels[code])
+        self.shifts_seen[bucket] += 1
+
+    def close_buckets(self, cube):
+        """Fold every bucket before the cube's latest booked one into the smoothed levels, each exactly once."""
+        if not cube.shifts:
+            return
+        latest_day = max(cube.shifts)
+        booked = [bucket for bucket, counts in enumerate(cube.shifts[latest_day].passenger_counts) if any(counts)]
+        latest = (latest_day, booked[-1] if booked else 0)  # Still open; more bookings may arrive
+
+        for day in sorted(cube.shifts):
+            if self.closed_through is not None and day < self.closed_through[0]:
+                continue
+            for bucket, counts in enumerate(cube.shifts[day].passenger_counts):
+                cell = (day, bucket)
+                if cell >= latest:
+                    return
+                if self.closed_through is not None and cell <= self.closed_through:
+                    continue
+                self._fold(bucket, counts)
+                self.closed_through = cell
+
+    def forecast(self, bucket):
+        """Return (destination, expected passengers) pairs for a bucket, busiest first."""
+        decode = self.destinations.decode
+        expected = ((decode(code), level) for code, level in enumerate(self.levels[bucket]) if level > 0)
+        return sorted(expected, key=itemgetter(1), reverse=True)
+
+def aggregate_by_buckets(records, buckets):
+    """Walk the parsed bookings once and put each into its shift's time bucket.
+
+    Returns an AggregateCube that any shift, bucket or destination can be read from.
+    """
+    cube = AggregateCube(buckets, records.destinations)
+    stats = ParseStats()
+    stats.merge(records.stats)
+    stats.skipped_rows = cube.add_bookings(records)
+    stats.log_summary("Refresh")
+    return cube
+
+# Everything the board reads, built from one full-sheet download and shared by every session until the cache expires
+BoardAggregates = namedtuple('BoardAggregates', ['cube', 'live', 'baselines', 'forecaster'])
+
+def load_board_aggregates():
+    """Download and parse the whole sheet and build the BoardAggregates, or return None if it holds no bookings."""
+    records = load_booking_records()
+    if not records:
+        return None
+    cube = aggregate_by_buckets(records, BOARD_BUCKETS)
+    live = LiveDemandWindow(records.destinations)
+    live.add_bookings(records)
+    baselines = DemandBaselines(records.destinations)
+    baselines.close_shifts(cube)
+    forecaster = DemandForecaster(BOARD_BUCKETS, records.destinations)
+    forecaster.close_buckets(cube)
+    return BoardAggregates(cube, live, baselines, forecaster)
+
+def fetch_board_aggregates(force_refresh=False):
+    """Fetch the BoardAggregates of the whole sheet, served from the shared cache when still fresh.
+
+    A cache hit reuses the built cube, baselines and forecaster as they are, so
+    a rerun neither re-parses the sheet nor refits anything.
+    """
+    cache = get_sheet_values_cache()
+    try:
+        aggregates = cache.get((SPREADSHEET_ID, RANGE_NAME), load_board_aggregates, force_refresh=force_refresh)
     except Exception as e:
-        logging.error(f"Error in time parsing: {e}")
-        return False
+        st.error(f"Error fetching data from Google Sheets: {e}")
+        return None
+
+    stats = cache.stats()
+    logging.info(f"Sheet cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+    if not aggregates:
+        st.warning("No data found or not enough data.")
+        return None
+
+    return aggregates
+
+# Immutable refresh results; they hold only tuples and read-only mappings, so one can be shared by every session
+IntervalRanking = namedtuple('IntervalRanking', ['interval', 'ranked_destinations', 'destination_revenue', 'usual', 'revenue'])
+BoardSnapshot = namedtuple('BoardSnapshot', [
+    'shift_date', 'latest_shift_date', 'as_of', 'live_demand', 'forecast_interval', 'forecast', 'rankings', 'total_revenue',
+])
+
+def build_interval_ranking(interval, ranked_destinations, destination_revenue, usual=None):
+    """Freeze one bucket's ranking, revenue per destination and baselines into an IntervalRanking."""
+    return IntervalRanking(
+        interval=interval,
+        ranked_destinations=tuple(ranked_destinations),
+        destination_revenue=MappingProxyType(dict(destination_revenue)),
+        usual=MappingProxyType(dict(usual or {})),
+        revenue=sum(destination_revenue.values()),
+    )
+
+def build_board_snapshot(cube, baselines, forecaster, live, shift_date, now):
+    """Read everything the board shows for one shift out of the running aggregates into a BoardSnapshot."""
+    weekday = shift_date.weekday()
+    rankings = []
+    for bucket, interval in enumerate(cube.intervals):
+        ranked_destinations, destination_revenue = cube.ranking(shift_date, [bucket])
+        usual = {destination: baselines.usual(weekday, bucket, destination) for destination, _ in ranked_destinations}
+        rankings.append(build_interval_ranking(interval, ranked_destinations, destination_revenue, usual))
+
+    next_bucket = cube.buckets.next_bucket(now)
+    return BoardSnapshot(
+        shift_date=shift_date,
+        latest_shift_date=cube.latest_shift_date(),
+        as_of=now,
+        live_demand=tuple((window, tuple(ranked)) for window, ranked in live.snapshot(now).items()),
+        forecast_interval=cube.buckets.interval(next_bucket),
+        forecast=tuple(forecaster.forecast(next_bucket)),
+        rankings=tuple(rankings),
+        total_revenue=sum(ranking.revenue for ranking in rankings),
+    )
 
-def pull_and_rank_data_by_hour(start_hour, end_hour):
-    """Pull data from Google Sheets, filter by specific hourly range, clean, and rank destinations."""
-    global total_revenue
-    creds = authenticate_service_account()
-    service = build('sheets', 'v4', credentials=creds)
-    sheet = service.spreadsheets()
+class IncrementalSheetSync:
+    """Append-only sync of the PRIORITY sheet that only fetches rows added since the last refresh.
 
+    The last ingested row is re-read on every refresh as an anchor; if it no
+    longer matches, rows were deleted or inserted above it and the sheet is
+    resynced from scratch. Only that one row is checked, so edits to earlier
+    rows that leave it in place go unnoticed until a full rebuild is asked
+    for. Rows are streamed into the cube one page at a time, so memory stays
+    bounded by SHEET_PAGE_SIZE.
+    """
+
+    # Attributes that make up the synced state, swapped in as a whole after a full resync
+    STATE = ('labels', 'destinations', 'cube', 'live', 'baselines', 'forecaster', 'rows_ingested', 'last_row')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.full_resyncs = 0
+        self._snapshots = {}  # Shift date -> (sync state and minute it was built at, BoardSnapshot)
+        self._lock = threading.Lock()  # Guards the synced state; never held across a sheet request
+        self._refresh_lock = threading.Lock()  # One refresh at a time
+        self._reset()
+
+    def _reset(self):
+        self.labels = DestinationLabels()  # Raw sheet labels
+        self.destinations = DestinationLabels()  # Clean destination names
+        self.cube = AggregateCube(self.buckets, self.destinations)
+        self.live = LiveDemandWindow(self.destinations)
+        self.baselines = DemandBaselines(self.destinations)
+        self.forecaster = DemandForecaster(self.buckets, self.destinations)
+        self.rows_ingested = 0  # Sheet rows consumed so far, header included
+        self.last_row = None
+
+    def _ingest(self, block):
+        if not block:
+            return
+        start = 1 if self.rows_ingested == 0 else 0  # The first row of a full sync is the header
+        with self._lock:
+            records = parse_bookings(block.tail(start) if start else block, self.destinations)
+            self.refresh_stats.merge(records.stats)
+            self.refresh_stats.skipped_rows += self.cube.add_bookings(records)
+            self.live.add_bookings(records)
+            self.rows_ingested += len(block)
+            self.last_row = block.row(len(block) - 1)
+
+    def _full_resync(self, fetch_range):
+        # Rebuild into fresh state and swap it in at the end, so sessions keep reading the old aggregates meanwhile
+        rebuilt = IncrementalSheetSync(self.buckets)
+        rebuilt.refresh_stats = self.refresh_stats
+        for page in iter_sheet_pages(fetch_range, rebuilt.labels):
+            rebuilt._ingest(page)
+        with self._lock:
+            for name in self.STATE:
+                setattr(self, name, getattr(rebuilt, name))
+            self.full_resyncs += 1
+
+    def refresh(self, fetch_range, force_full=False):
+        """Bring the aggregates up to date and return the cube."""
+        with self._refresh_lock:
+            self.refresh_stats = ParseStats()
+            if force_full or self.rows_ingested == 0:
+                self._full_resync(fetch_range)
+            else:
+                pages = iter_sheet_pages(fetch_range, self.labels, first_row=self.rows_ingested)
+                first_page = next(pages, None)
+                if not first_page or first_page.row(0) != self.last_row:
+                    logging.info("Last synced PRIORITY row has moved or changed; running a full resync.")
+                    self._full_resync(fetch_range)
+                else:
+                    self._ingest(first_page.tail(1))
+                    for page in pages:
+                        self._ingest(page)
+            with self._lock:
+                self.baselines.close_shifts(self.cube)
+                self.forecaster.close_buckets(self.cube)
+                cube = self.cube
+            self.refresh_stats.log_summary("Incremental sync")
+            return cube
+
+    def board_snapshot(self, shift_date, now):
+        """Return the BoardSnapshot of a shift as of now, reusing the one built for another session in the same minute."""
+        with self._lock:
+            version = (self.full_resyncs, self.rows_ingested, datetime_to_minute(now))
+            cached = self._snapshots.get(shift_date)
+            if cached and cached[0] == version:
+                return cached[1]
+            snapshot = build_board_snapshot(self.cube, self.baselines, self.forecaster, self.live, shift_date, now)
+            self._snapshots[shift_date] = (version, snapshot)
+            return snapshot
+
+@st.cache_resource
+def get_incremental_sync():
+    """Return the process-wide incremental sync state for the hourly board."""
+    return IncrementalSheetSync(BOARD_BUCKETS)
+
+def fetch_incremental_aggregates(force_refresh=False, rebuild=False):
+    """Return the shift-partitioned aggregates of the incrementally synced sheet, reusing fresh results from the cache.
+
+    force_refresh skips the cache TTL but still only fetches new rows; rebuild
+    re-reads the whole sheet and replaces the aggregates every session shares.
+    """
+    cache = get_sheet_values_cache()
+    sync = get_incremental_sync()
+    full_resyncs = sync.full_resyncs
     try:
-        result = sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=RANGE_NAME).execute()
-        values = result.get('values', [])
-        logging.info(f"Fetched {len(values)} rows from the sheet.")  # Logging the output instead of displaying it
+        cube = cache.get(
+            (SPREADSHEET_ID, f"{RANGE_NAME} (incremental)"),  # Distinct from the full-sheet entry
+            lambda: sync.refresh(download_sheet_values, force_full=rebuild),
+            force_refresh=force_refresh or rebuild,
+        )
     except Exception as e:
         st.error(f"Error fetching data from Google Sheets: {e}")
-        return
+        return None
 
-    if not values or len(values) < 2:
+    if rebuild and sync.full_resyncs == full_resyncs:
+        st.warning("Rebuild from the full sheet failed; showing the last synced data.")
+
+    if not cube:
         st.warning("No data found or not enough data.")
-        return
+        return None
 
-    passenger_counts = {}
-    destination_prices = {}
-    hourly_revenue = 0
+    return cube
 
-    for row in values[1:]:
-        if len(row) < 2:
-            continue  # Skip any incomplete rows
+def render_live_demand(demand):
+    """Write how many passengers booked each destination in every live window."""
+    for window, ranked_destinations in demand:
+        st.write(f"\nPassengers Waiting in the Last {window} Minutes:")
+        if not ranked_destinations:
+            st.write("No bookings.")
+        for destination, count in ranked_destinations:
+            st.write(f"{destination}: {count} passengers")
 
-        timestamp_str, destination = row[0], row[1]
+def render_forecast(interval, forecast):
+    """Write the expected passengers per destination for an upcoming time bucket."""
+    st.write(f"\nForecast for {format_interval(interval)}:")
+    if not forecast:
+        st.write("Not enough history yet.")
+    for destination, expected in forecast:
+        st.write(f"{destination}: {expected:.1f} passengers expected")
 
-        # Log the processing of the row in the background
-        logging.debug(f"Processing row: Timestamp: {timestamp_str}, Destination: {destination}")
-
-        if is_within_hour_range(timestamp_str, start_hour, end_hour):
-            price = extract_price_from_destination(destination)
-            clean_dest = re.sub(r" \(\d+KSH\)", "", destination)
-
-            passenger_counts[clean_dest] = passenger_counts.get(clean_dest, 0) + 1
-            destination_prices[clean_dest] = price
-        else:
-            logging.debug(f"Row skipped. Not in the time range {start_hour}:00 - {end_hour}:00")
-
-    ranked_destinations = sorted(passenger_counts.items(), key=itemgetter(1), reverse=True)
-
-    st.write(f"\nCurrent Ranking of Destinations for {start_hour}:00 - {end_hour}:00 by Passenger Count:")
-    for rank, (destination, count) in enumerate(ranked_destinations, start=1):
-        price = destination_prices.get(destination, 0)
-        revenue_for_destination = count * price
-        hourly_revenue += revenue_for_destination
-        st.write(f"{rank}. {destination}: {count} passengers, Potential Revenue: {revenue_for_destination} KSH")
-
-    st.write(f"Potential Total Revenue for {start_hour}:00 - {end_hour}:00: {hourly_revenue} KSH")
-
-    total_revenue += hourly_revenue
-
-    return ranked_destinations
-
-def run_hourly_updates():
-    global total_revenue
-    total_revenue = 0  # Reset the total revenue each time the refresh button is clicked
-
-    hourly_intervals = [
-        (23, 0),  # 11 PM - 12 AM
-        (0, 1),   # 12 AM - 1 AM
-        (1, 2),   # 1 AM - 2 AM
-        (2, 3),   # 2 AM - 3 AM
-        (3, 4),   # 3 AM - 4 AM
-        (4, 5),   # 4 AM - 5 AM
-        (5, 6),   # 5 AM - 6 AM
-        (6, 7),   # 6 AM - 7 AM
-    ]
-    
-    for start_hour, end_hour in hourly_intervals:
-        pull_and_rank_data_by_hour(start_hour, end_hour)
+def format_interval(interval):
+    """Format a (start, end) pair of times as 'HH:MM - HH:MM'."""
+    start, end = interval
+    return f"{start:%H:%M} - {end:%H:%M}"
+
+def format_usual_demand(count, usual):
+    """Describe how a passenger count compares with its (mean, standard deviation) baseline."""
+    if usual is None:
+        return ""
+    mean, deviation = usual
+    if abs(count - mean) > max(deviation, BASELINE_MIN_DEVIATION):
+        trend = "busier than usual" if count > mean else "quieter than usual"
+    else:
+        trend = "about usual"
+    return f" (usual {mean:.1f}, {count - mean:+.1f}, {trend})"
+
+def render_interval_ranking(ranking):
+    """Write the IntervalRanking of one time bucket.
+
+    Its usual mapping, when filled, gives the (mean, standard deviation) of
+    each destination's passengers in this bucket on the same weekday.
+    """
+    label = format_interval(ranking.interval)
+
+    st.write(f"\nCurrent Ranking of Destinations for {label} by Passenger Count:")
+    for rank, (destination, count) in enumerate(ranking.ranked_destinations, start=1):
+        # Summed per booking, so fares that changed during the bucket are counted at the price paid
+        revenue_for_destination = ranking.destination_revenue.get(destination, 0)
+        comparison = format_usual_demand(count, ranking.usual.get(destination))
+        st.write(f"{rank}. {destination}: {count} passengers{comparison}, Potential Revenue: {revenue_for_destination} KSH")
+
+    st.write(f"Potential Total Revenue for {label}: {ranking.revenue} KSH")
+
+def render_board(snapshot):
+    """Write a BoardSnapshot: live demand, the next bucket's forecast and every bucket of the shift."""
+    # Show what is waiting right now and what the next bucket should bring before the shift board
+    render_live_demand(snapshot.live_demand)
+    render_forecast(snapshot.forecast_interval, snapshot.forecast)
+    st.write("\n\n\n")
+
+    latest = snapshot.latest_shift_date
+    if latest and not any(ranking.ranked_destinations for ranking in snapshot.rankings):
+        st.info(f"No bookings for the shift starting {snapshot.shift_date:%d %b %Y}; the most recent shift started {latest:%d %b %Y}.")
+
+    for ranking in snapshot.rankings:
+        render_interval_ranking(ranking)
 
         # Add triple space between each hourly interval output
         st.write("\n\n\n")
 
-    st.write(f"\nPotential Total Revenue for the Day: {total_revenue} KSH")
+    st.write(f"\nPotential Total Revenue for the Day: {snapshot.total_revenue} KSH")
+
+def run_hourly_updates(shift_date, force_refresh=False, rebuild=False):
+    """Refresh the aggregates, render the board for a shift and return its BoardSnapshot."""
+    now = sheet_now()
+    if INCREMENTAL_SYNC:
+        # Only rows appended since the last refresh are fetched and folded into the running aggregates
+        cube = fetch_incremental_aggregates(force_refresh=force_refresh, rebuild=rebuild)
+        snapshot = get_incremental_sync().board_snapshot(shift_date, now) if cube is not None else None
+    else:
+        # Fetch the sheet once, bucket every shift from a single pass over the rows and reuse the result until it expires
+        aggregates = fetch_board_aggregates(force_refresh=force_refresh or rebuild)
+        snapshot = None
+        if aggregates is not None:
+            snapshot = build_board_snapshot(
+                aggregates.cube, aggregates.baselines, aggregates.forecaster, aggregates.live, shift_date, now
+            )
+    if snapshot is None:
+        return
+
+    render_board(snapshot)
+    return snapshot
+
+# Parse the pinned discovery document at startup rather than on the first refresh
+load_sheets_discovery_document()
 
 # Add a centered header for "TATU CITY TRANSPORT"
 st.markdown("<h1 style='text-align: center; color: white;'>TATU CITY TRANSPORT</h1>", unsafe_allow_html=True)
 
+# Pick the night to show; a shift is dated by the evening it starts, so after midnight this is still yesterday
+shift_date = st.date_input('Shift date', value=BOARD_BUCKETS.shift_date(sheet_now()))
+
+# Bypass the shared sheet cache and fetch new rows from Google Sheets straight away
+force_refresh = st.checkbox('Force refresh (ignore cached sheet data)')
+
 # Streamlit button for refreshing data
 if st.button('Refresh Data'):
-    run_hourly_updates()
+    run_hourly_updates(shift_date, force_refresh=force_refresh)
+
+# Re-read the whole sheet, e.g. after past rows were edited; this rebuilds the board for every session
+if st.button('Rebuild from Full Sheet'):
+    run_hourly_updates(shift_date, rebuild=True)
+
+cache_stats = get_sheet_values_cache().stats()
+st.caption(
+    f"Sheet cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+    f"{cache_stats['stale_hits']} stale, TTL {SHEET_CACHE_TTL_SECONDS}s"
+)
 
 
@@ -0,0 +1,143 @@
+"""Check that the vectorized and row-wise backends in app.py agree.
+
+The same synthetic PRIORITY sheet, with a sprinkling of blank, malformed and
+price-less rows, is served through sheet_sources.LocalFileSource both as
+serial numbers and as formatted strings, and parsed with
+parse_bookings_vectorized and parse_bookings_rowwise. The parsed bookings are
+then folded into AggregateCubes with the bincount kernel and with the per-row
+loop, for 60- and 15-minute buckets, both in one batch and page by page. Any
+difference in the parsed columns, parse statistics or cube cells is reported.
+
+Run ``python check_backends.py`` (or ``--rows 100000``, or ``--data sheet.csv``
+to check a real export); it exits non-zero if the backends disagree.
+"""
+import argparse
+import logging
+import random
+import sys
+
+import numpy as np
+
+import app
+from sheet_sources import LocalFileSource, generate_rows, load_rows
+
+def add_bad_rows(rows, seed=0):
+    """Overwrite a few data rows with the kinds of cells the booking form produces by mistake."""
+    rng = random.Random(seed)
+    bad_cells = [
+        ['', ''],  # Cleared row
+        ['', 'Junction (100KSH)'],  # Missing timestamp
+        ['not a date', 'Ruiru (80KSH)'],  # Unparseable timestamp
+        ['01/02/2025 23:15:00', ''],  # Missing destination
+        ['01/02/2025 23:20:00', 'Walk-in'],  # Destination without a price
+        ['2025-01-02 23:25:00', 'Kiambu Road (120KSH)'],  # ISO layout in a US-layout column
+    ]
+    for cells in bad_cells:
+        rows[rng.randrange(1, len(rows))] = list(cells)
+    return rows
+
+def render_options(serial):
+    if serial:
+        return {'value_render_option': 'UNFORMATTED_VALUE', 'date_time_render_option': 'SERIAL_NUMBER'}
+    return {'value_render_option': 'FORMATTED_VALUE'}
+
+def load_block(source, serial):
+    """Fetch the whole sheet column-major, as download_sheet_values does, and drop the header row."""
+    columns = source.fetch_range(app.RANGE_NAME, major_dimension='COLUMNS', **render_options(serial))
+    return app.SheetColumns.from_value_range(columns, app.DestinationLabels()).tail(1)
+
+def compare_records(vectorized, rowwise):
+    """Return a list of differences between two BookingRecords tables."""
+    differences = []
+    if vectorized.destinations.labels != rowwise.destinations.labels:
+        differences.append(f"destinations: {vectorized.destinations.labels} != {rowwise.destinations.labels}")
+    for field in ('rows', 'short_rows', 'unparseable_rows'):
+        if getattr(vectorized.stats, field) != getattr(rowwise.stats, field):
+            differences.append(f"stats.{field}: {getattr(vectorized.stats, field)} != {getattr(rowwise.stats, field)}")
+
+    columns = {
+        'timestamps': (np.asarray(vectorized.timestamps, dtype='datetime64[s]'), np.array(rowwise.timestamps, dtype='datetime64[s]')),
+    }
+    for field in ('minutes', 'days', 'destination_codes', 'prices'):
+        columns[field] = (np.asarray(getattr(vectorized, field), dtype=np.int64), np.asarray(getattr(rowwise, field), dtype=np.int64))
+    for field, (left, right) in columns.items():
+        if left.shape != right.shape:
+            differences.append(f"{field}: {len(left)} rows != {len(right)} rows")
+        elif not np.array_equal(left, right):
+            differences.append(f"{field}: first difference at row {int(np.flatnonzero(left != right)[0])}")
+    return differences
+
+def check_parsing(source, serial):
+    block = load_block(source, serial)
+    vectorized = app.parse_bookings_vectorized(block, app.DestinationLabels())
+    rowwise = app.parse_bookings_rowwise(block, app.DestinationLabels())
+    return vectorized, compare_records(vectorized, rowwise)
+
+def cube_cells(cube):
+    """Return a cube's contents as plain values: shift day -> (counts, revenue, rows)."""
+    return {
+        day: (partition.passenger_counts, partition.destination_revenue, partition.rows)
+        for day, partition in cube.shifts.items()
+    }
+
+def aggregate(records, buckets, vectorized, batch_size=None):
+    """Fold records into a new AggregateCube with one backend, in one batch or in batches of batch_size rows."""
+    cube = app.AggregateCube(buckets, records.destinations)
+    batch_size = batch_size or max(len(records), 1)
+    skipped = 0
+    default, app.VECTORIZED_AGGREGATION = app.VECTORIZED_AGGREGATION, vectorized
+    for start in range(0, max(len(records), 1), batch_size):
+        batch = app.BookingRecords.from_columns(
+            destinations=records.destinations,
+            timestamps=records.timestamps[start:start + batch_size],
+            minutes=records.minutes[start:start + batch_size],
+            days=records.days[start:start + batch_size],
+            destination_codes=records.destination_codes[start:start + batch_size],
+            prices=records.prices[start:start + batch_size],
+            stats=app.ParseStats(),
+        )
+        skipped += cube.add_bookings(batch)
+    app.VECTORIZED_AGGREGATION = default
+    return skipped, cube_cells(cube)
+
+def check_aggregation(records):
+    differences = []
+    for bucket_minutes in (60, 15):
+        buckets = app.ShiftBuckets(app.SHIFT_START, app.SHIFT_END, bucket_minutes)
+        for batch_size in (None, app.SHEET_PAGE_SIZE):
+            vectorized = aggregate(records, buckets, vectorized=True, batch_size=batch_size)
+            rowwise = aggregate(records, buckets, vectorized=False, batch_size=batch_size)
+            if vectorized != rowwise:
+                batches = f"batches of {batch_size}" if batch_size else "one batch"
+                differences.append(f"{bucket_minutes}-minute buckets, {batches}: cubes differ")
+    return differences
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the vectorized and row-wise backends agree.")
+    parser.add_argument('--data', help="CSV or JSONL sheet export to check (defaults to a synthetic sheet)")
+    parser.add_argument('--rows', type=int, default=20000, help="Synthetic bookings to generate when --data is not given")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    rows = load_rows(args.data) if args.data else add_bad_rows(generate_rows(args.rows))
+    source = LocalFileSource(rows=rows)
+
+    failed = False
+    for serial in (True, False):
+        rendering = 'serial numbers' if serial else 'formatted strings'
+        records, differences = check_parsing(source, serial)
+        for difference in differences:
+            print(f"Parsing ({rendering}): {difference}")
+        failed = failed or bool(differences)
+        print(f"Parsing ({rendering}): {'MISMATCH' if differences else 'ok'}")
+
+    differences = check_aggregation(records)
+    for difference in differences:
+        print(f"Aggregation: {difference}")
+    failed = failed or bool(differences)
+    print(f"Aggregation: {'MISMATCH' if differences else 'ok'}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
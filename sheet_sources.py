@@ -0,0 +1,220 @@
+"""Offline stand-ins for the Google Sheets API.
+
+LocalFileSource serves a CSV or JSONL file as if it were the PRIORITY sheet,
+and FakeSheetsServer exposes the same data over HTTP with the Sheets v4
+``values.get`` URL layout and value-range JSON, so the whole refresh path can
+be benchmarked and load-tested without live Google credentials.
+
+Run ``python sheet_sources.py serve --rows 100000`` to start a fake server
+with a synthetic sheet, or ``python sheet_sources.py generate out.csv`` to
+write one to disk.
+"""
+import argparse
+import csv
+import datetime
+import json
+import logging
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Timestamp layouts the booking form writes, used to emulate serial-number date rendering
+DATE_FORMATS = ['%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+SHEETS_EPOCH = datetime.datetime(1899, 12, 30)  # Day zero of Google Sheets date serial numbers
+
+# A1 range such as PRIORITY!A2:B5001, PRIORITY!A:B or PRIORITY!A10:B
+RANGE_PATTERN = re.compile(r"^(?:'?(?P<sheet>[^'!]+)'?!)?(?P<c1>[A-Z]+)(?P<r1>\d*):(?P<c2>[A-Z]+)(?P<r2>\d*)$")
+
+SAMPLE_DESTINATIONS = [
+    'Junction (100KSH)',
+    'Two Rivers Mall (150KSH)',
+    'Ruiru (80KSH)',
+    'Kiambu Road (120KSH)',
+    'Thika Road Mall (130KSH)',
+]
+
+def column_index(letters):
+    """Convert a column name such as 'A' or 'AB' to a zero-based index."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+def to_serial(value):
+    """Render a formatted timestamp as a Sheets date-time serial number, leaving other cells untouched."""
+    if not isinstance(value, str):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            timestamp = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return (timestamp - SHEETS_EPOCH).total_seconds() / 86400
+    return value
+
+def _trim_trailing_blanks(cells):
+    while cells and cells[-1] == '':
+        cells.pop()
+    return cells
+
+def value_range(rows, range_name, major_dimension='ROWS', value_render_option='FORMATTED_VALUE',
+                date_time_render_option='SERIAL_NUMBER'):
+    """Slice rows the way ``spreadsheets.values.get`` does and return its value-range JSON body."""
+    match = RANGE_PATTERN.match(range_name)
+    if not match:
+        raise ValueError(f"Unsupported range: {range_name}")
+
+    first_col, last_col = column_index(match['c1']), column_index(match['c2'])
+    first_row = int(match['r1'] or 1) - 1
+    last_row = int(match['r2']) if match['r2'] else len(rows)
+    serial_dates = value_render_option == 'UNFORMATTED_VALUE' and date_time_render_option == 'SERIAL_NUMBER'
+
+    grid = []
+    for row in rows[first_row:last_row]:
+        cells = [row[col] if col < len(row) else '' for col in range(first_col, last_col + 1)]
+        if serial_dates:
+            cells = [to_serial(cell) for cell in cells]
+        grid.append(cells)
+
+    if major_dimension == 'COLUMNS':
+        grid = [list(column) for column in zip(*grid)]
+    # The API drops trailing empty cells within each line and trailing empty lines
+    values = [_trim_trailing_blanks(line) for line in grid]
+    while values and not values[-1]:
+        values.pop()
+
+    body = {'range': range_name, 'majorDimension': major_dimension}
+    if values:
+        body['values'] = values
+    return body
+
+def load_rows(path):
+    """Load sheet rows (header first) from a CSV or JSONL file."""
+    if path.endswith('.jsonl'):
+        rows = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    if not rows:
+                        rows.append(list(record))  # Header from the first object's keys
+                    record = [record.get(key, '') for key in rows[0]]
+                rows.append(record)
+        return rows
+
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row for row in csv.reader(f)]
+
+def generate_rows(count, start=None, destinations=SAMPLE_DESTINATIONS, seed=0):
+    """Generate a synthetic PRIORITY sheet of count bookings spread over night shifts."""
+    rng = random.Random(seed)
+    timestamp = start or datetime.datetime(2025, 1, 1, 23, 0, 0)
+    rows = [['Timestamp', 'Destination']]
+    for _ in range(count):
+        timestamp += datetime.timedelta(seconds=rng.randint(1, 90))
+        if 7 <= timestamp.hour < 23:
+            timestamp = timestamp.replace(hour=23, minute=0, second=0)  # Jump to the next night shift
+        rows.append([timestamp.strftime(DATE_FORMATS[0]), rng.choice(destinations)])
+    return rows
+
+class LocalFileSource:
+    """Data source that serves a local CSV/JSONL file in the Sheets value-range layout."""
+
+    def __init__(self, path=None, rows=None):
+        self.rows = rows if rows is not None else load_rows(path)
+
+    def fetch_range(self, range_name, **params):
+        """Return the ``values`` of a range, as ``spreadsheets.values.get`` would."""
+        return value_range(self.rows, range_name, **params).get('values', [])
+
+class _FakeSheetsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = re.match(r"^/v4/spreadsheets/(?P<spreadsheet_id>[^/]+)/values/(?P<range>[^/]+)$", url.path)
+        if not match:
+            self._send_json(404, {'error': {'code': 404, 'message': f"Unknown path {url.path}", 'status': 'NOT_FOUND'}})
+            return
+
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            body = value_range(
+                self.server.rows,
+                unquote(match['range']),
+                major_dimension=query.get('majorDimension', 'ROWS'),
+                value_render_option=query.get('valueRenderOption', 'FORMATTED_VALUE'),
+                date_time_render_option=query.get('dateTimeRenderOption', 'SERIAL_NUMBER'),
+            )
+        except ValueError as e:
+            self._send_json(400, {'error': {'code': 400, 'message': str(e), 'status': 'INVALID_ARGUMENT'}})
+            return
+        self._send_json(200, body)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Fake Sheets API: {format % args}")
+
+class FakeSheetsServer:
+    """In-process HTTP server that answers Sheets v4 ``values.get`` requests from in-memory rows."""
+
+    def __init__(self, rows, host='127.0.0.1', port=0):
+        self._server = ThreadingHTTPServer((host, port), _FakeSheetsHandler)
+        self._server.rows = rows
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        """Serve requests on a daemon thread and return self."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"Fake Sheets API serving {len(self._server.rows)} rows at {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-ins for the PRIORITY Google Sheet.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="Run a fake Sheets API server.")
+    serve.add_argument('--data', help="CSV or JSONL file to serve (defaults to a synthetic sheet)")
+    serve.add_argument('--rows', type=int, default=10000, help="Synthetic bookings to generate when --data is not given")
+    serve.add_argument('--port', type=int, default=8765)
+
+    generate = subparsers.add_parser('generate', help="Write a synthetic PRIORITY sheet to a CSV file.")
+    generate.add_argument('path')
+    generate.add_argument('--rows', type=int, default=10000)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'generate':
+        with open(args.path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(generate_rows(args.rows))
+        return
+
+    rows = load_rows(args.data) if args.data else generate_rows(args.rows)
+    server = FakeSheetsServer(rows, port=args.port).start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()